@@ -1,27 +1,277 @@
+from __future__ import annotations
+
+import asyncio
 import os
+import shutil
 import subprocess
 import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; cloning then falls back to a plain copy
+    fcntl = None  # type: ignore[assignment]
+
+try:
+    import av
+except ImportError:
+    # PyAV is optional; without it we fall back to the ffmpeg binary
+    av = None  # type: ignore[assignment]
+
+
+def _pyav_has_encoder(name: str) -> bool:
+    """Verificar se a build do PyAV instalada inclui o codificador informado."""
+    try:
+        av.Codec(name, "w")
+        return True
+    except ValueError:
+        return False
+
 
-def convert_to_opus_ogg(input_file, output_file=None, bitrate="32k", sample_rate=24000):
+# Some PyAV builds ship without libopus; those still go through the ffmpeg binary
+_PYAV_OPUS = av is not None and _pyav_has_encoder("libopus")
+
+
+class FfmpegWorkerPool:
     """
-    Converter um arquivo de áudio para formato Opus em um contêiner Ogg.
+    Limitar quantas conversões de áudio rodam ao mesmo tempo.
+    
+    O ffmpeg não aceita novos trabalhos por stdin depois de iniciado, então em vez de
+    manter processos vivos o pool reserva um slot por conversão: rajadas de mensagens
+    de áudio esperam na fila em vez de disputar os mesmos núcleos.
     
     Args:
-        input_file (str): Caminho para o arquivo de áudio de entrada
-        output_file (str, optional): Caminho para salvar o arquivo de saída. Se None, substitui a
-                                    extensão do input_file por .ogg
-        bitrate (str, optional): Taxa de bits alvo para codificação Opus (padrão: "32k")
-        sample_rate (int, optional): Taxa de amostragem para a saída (padrão: 24000)
+        size (int, optional): Número máximo de conversões simultâneas. Se None, usa
+                              um slot por núcleo disponível
+    """
+    
+    def __init__(self, size: Optional[int] = None) -> None:
+        # Each encoder is pinned to a single thread, so one slot per core
+        self.size = size or os.cpu_count() or 1
+        self._slots = threading.BoundedSemaphore(self.size)
+        # Reservations take their slots one at a time under this lock, so two multi-slot
+        # reservations can never each hold part of what they need and wait on each other
+        self._reserve_lock = threading.Lock()
+        # Async callers wait for slots and run blocking encodes here, never in the event loop's
+        # default executor, which the other tools need for their SQLite and HTTP calls
+        self.executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="ffmpeg-pool")
+    
+    def _reserve(self, slots: int) -> None:
+        """Bloquear até reservar `slots` slots de conversão."""
+        with self._reserve_lock:
+            for _ in range(slots):
+                self._slots.acquire()
+    
+    def _free(self, slots: int) -> None:
+        """Devolver `slots` slots de conversão ao pool."""
+        for _ in range(slots):
+            self._slots.release()
+    
+    @contextmanager
+    def acquire(self, slots: int = 1) -> Iterator[None]:
+        """Reservar slots de conversão enquanto o bloco `with` estiver ativo, um por processo do ffmpeg."""
+        # Never ask for more slots than exist, or a small pool would wait forever
+        count = min(slots, self.size)
+        self._reserve(count)
+        try:
+            yield
+        finally:
+            self._free(count)
+    
+    async def acquire_async(self) -> None:
+        """Reservar um slot de conversão sem bloquear o event loop; liberar com release()."""
+        # Wait in a pool thread so waiters are woken in arrival order, like the sync path
+        waiter = asyncio.get_running_loop().run_in_executor(self.executor, self._reserve, 1)
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            # The thread still gets its slot eventually; hand it back instead of leaking it
+            waiter.add_done_callback(lambda _: self._free(1))
+            raise
+    
+    def release(self) -> None:
+        """Liberar um slot reservado com acquire_async()."""
+        self._free(1)
+    
+    def run(self, cmd: Sequence[str]) -> subprocess.CompletedProcess[bytes]:
+        """Executar um comando ffmpeg ocupando um slot do pool."""
+        with self.acquire():
+            return subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                check=True
+            )
+
+
+_ffmpeg_pool = FfmpegWorkerPool()
+
+# 40ms frames: still efficient for voice, with a cheaper MDCT than 60ms frames
+_OPUS_FRAME_DURATION = 40
+
+# Sample rate of the 8-bit mu-law intermediate used by the low-bitrate pipeline
+_MULAW_SAMPLE_RATE = 16000
+
+# Constant parts of the ffmpeg command line, built once at import time. There is no
+# -dtx: the libopus wrapper in FFmpeg 7.0 doesn't list it (ffmpeg -h encoder=libopus)
+# and ffmpeg only warns that the option went unused
+_FFMPEG_HEAD = (
+    "ffmpeg",
+    "-nostdin",
+    "-loglevel", "error",        # Keep stderr empty unless something fails
+    "-nostats",
+)
+_FFMPEG_TAIL = (
+    "-threads", "1",             # One core per conversion; batches run in parallel
+    "-ac", "1",                  # Downmix first so libopus never encodes stereo
+    "-c:a", "libopus",
+    "-application", "voip",      # Optimize for voice
+    "-vbr", "on",                # Variable bitrate
+    "-frame_duration", str(_OPUS_FRAME_DURATION),
+    "-packet_loss", "0",         # Stored files, no loss to protect against
+    "-mapping_family", "0",      # Plain mono/stereo mapping, no surround analysis
+    "-apply_phase_inv", "0",     # No intensity-stereo phase inversion for mono
+    "-y",                        # Overwrite output file if it exists
+)
+
+# Temporary conversions go to tmpfs when available so they never hit the disk
+TEMP_AUDIO_DIR: Optional[str] = os.getenv("TEMP_AUDIO_DIR", "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None)
+
+
+def _parse_bitrate(bitrate: str) -> int:
+    """Converter uma taxa de bits no estilo do ffmpeg (ex.: "32k") em bits por segundo."""
+    value = str(bitrate).strip().lower()
+    if value.endswith("k"):
+        return int(float(value[:-1]) * 1000)
+    if value.endswith("m"):
+        return int(float(value[:-1]) * 1000000)
+    return int(value)
+
+
+def _probe_audio_stream(input_file: str) -> Optional[Tuple[str, str, int]]:
+    """
+    Obter o contêiner, o codec e o número de canais do primeiro stream de áudio.
+    
+    Args:
+        input_file (str): Caminho para o arquivo de áudio
     
     Returns:
-        str: Caminho para o arquivo convertido
-        
-    Raises:
-        FileNotFoundError: Se o arquivo de entrada não existir
-        RuntimeError: Se a conversão ffmpeg falhar
+        tuple: (formato do contêiner, codec, canais), ou None se não for possível inspecionar o arquivo
     """
+    if av is not None:
+        try:
+            with av.open(input_file) as container:
+                if not container.streams.audio:
+                    return None
+                stream = container.streams.audio[0]
+                return container.format.name, stream.codec_context.name, stream.channels
+        except av.FFmpegError:
+            return None
+    
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name,channels:format=format_name",
+        "-of", "default=noprint_wrappers=1",
+        input_file
+    ]
+    try:
+        process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    
+    fields = dict(line.split("=", 1) for line in process.stdout.splitlines() if "=" in line)
+    try:
+        return fields["format_name"], fields["codec_name"], int(fields["channels"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _is_opus_voice(input_file: str) -> bool:
+    """Verificar se o arquivo já é Opus mono em um contêiner Ogg, pronto para ser enviado."""
+    # Opus always decodes at 48 kHz, so the sample rate says nothing about the encode
+    return _probe_audio_stream(input_file) == ("ogg", "opus", 1)
+
+
+def _encode_opus_pyav(input_file: str, output_file: str, bitrate: str, sample_rate: int, compression_level: int) -> None:
+    """
+    Codificar o áudio em Opus/Ogg dentro do processo usando a libopus via PyAV.
+    
+    Args:
+        input_file (str): Caminho para o arquivo de áudio de entrada
+        output_file (str): Caminho para salvar o arquivo de saída
+        bitrate (str): Taxa de bits alvo para codificação Opus
+        sample_rate (int): Taxa de amostragem para a saída
+        compression_level (int): Complexidade do codificador libopus (0-10)
+    """
+    frame_size = sample_rate * _OPUS_FRAME_DURATION // 1000
+    
+    with av.open(input_file) as source:
+        if not source.streams.audio:
+            raise RuntimeError(f"Falha ao converter áudio: nenhum stream de áudio em {input_file}")
+        input_stream = source.streams.audio[0]
+        
+        with av.open(output_file, "w", format="ogg") as target:
+            output_stream = target.add_stream("libopus", rate=sample_rate)
+            output_stream.bit_rate = _parse_bitrate(bitrate)
+            output_stream.layout = "mono"
+            output_stream.options = {
+                "application": "voip",  # Optimize for voice
+                "vbr": "on",            # Variable bitrate
+                "compression_level": str(compression_level),
+                "frame_duration": str(_OPUS_FRAME_DURATION),
+                "packet_loss": "0",
+                "mapping_family": "0",
+                "apply_phase_inv": "0",
+            }
+            
+            # libopus only accepts fixed-size frames, so buffer resampled audio in a FIFO
+            resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+            fifo = av.AudioFifo()
+            
+            def encode(frame: Any) -> None:
+                for packet in output_stream.encode(frame):
+                    target.mux(packet)
+            
+            for frame in source.decode(input_stream):
+                frame.pts = None
+                for resampled in resampler.resample(frame):
+                    fifo.write(resampled)
+                while fifo.samples >= frame_size:
+                    encode(fifo.read(frame_size))
+            
+            for resampled in resampler.resample(None):
+                fifo.write(resampled)
+            while fifo.samples >= frame_size:
+                encode(fifo.read(frame_size))
+            if fifo.samples:
+                encode(fifo.read())
+            
+            # Flush the encoder
+            encode(None)
+
+
+def _check_input(input_file: str) -> None:
+    """Garantir que o arquivo de entrada exista."""
     if not os.path.isfile(input_file):
         raise FileNotFoundError(f"Arquivo de entrada não encontrado: {input_file}")
+
+
+def _temp_output_path() -> str:
+    """Gerar um caminho único para uma conversão temporária, sem criar o arquivo."""
+    # ffmpeg/PyAV create the file themselves; a uuid4 name can't collide with another conversion
+    return os.path.join(TEMP_AUDIO_DIR or tempfile.gettempdir(), f"wa-{uuid.uuid4().hex}.ogg")
+
+
+def _prepare_output(input_file: str, output_file: Optional[str]) -> str:
+    """Validar a entrada e garantir que o diretório de saída exista, retornando o caminho de saída."""
+    _check_input(input_file)
     
     # If no output file is specified, replace the extension with .ogg
     if output_file is None:
@@ -32,36 +282,248 @@ def convert_to_opus_ogg(input_file, output_file=None, bitrate="32k", sample_rate
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    # Build the ffmpeg command
-    cmd = [
-        "ffmpeg",
+    return output_file
+
+
+# ioctl request that makes a file share the extents of another (btrfs, XFS)
+_FICLONE = 0x40049409
+
+
+def _clone_or_copy(src: str, dst: str) -> None:
+    """Copiar src para dst com um reflink ou, em último caso, uma cópia completa."""
+    # Replace dst instead of truncating it: an existing dst may share its inode with another file
+    _remove_quietly(dst)
+    
+    if fcntl is not None:
+        try:
+            with open(src, "rb") as source, open(dst, "xb") as target:
+                fcntl.ioctl(target.fileno(), _FICLONE, source.fileno())
+            return
+        except OSError:
+            # The empty file created above is ours, so copying over it is safe
+            pass
+    
+    shutil.copyfile(src, dst)
+
+
+def _is_same_file(path: str, other: str) -> bool:
+    """Verificar se os dois caminhos apontam para o mesmo arquivo, inclusive via links."""
+    try:
+        return os.path.samefile(path, other)
+    except FileNotFoundError:
+        return False
+
+
+def _copy_if_opus_voice(input_file: str, output_file: str) -> bool:
+    """Copiar a entrada para a saída se ela já for Opus mono/Ogg, retornando se a cópia foi feita."""
+    if not _is_opus_voice(input_file):
+        return False
+    if not _is_same_file(input_file, output_file):
+        _clone_or_copy(input_file, output_file)
+    return True
+
+
+def _ffmpeg_cmd(input_file: str, output_file: str, bitrate: str, sample_rate: int, compression_level: int) -> Tuple[str, ...]:
+    """Montar a linha de comando do ffmpeg para a conversão em Opus/Ogg."""
+    return (
+        *_FFMPEG_HEAD,
         "-i", input_file,
-        "-c:a", "libopus",
+        "-map", "0:a:0",             # Fail on inputs without audio, like the PyAV path, instead of muxing video
         "-b:a", bitrate,
         "-ar", str(sample_rate),
-        "-application", "voip",  # Optimize for voice
-        "-vbr", "on",           # Variable bitrate
-        "-compression_level", "10",  # Maximum compression
-        "-frame_duration", "60",     # 60ms frames (good for voice)
-        "-y",                        # Overwrite output file if it exists
+        "-compression_level", str(compression_level),  # Voice quality plateaus above ~7
+        *_FFMPEG_TAIL,
         output_file
-    ]
+    )
+
+
+def _ffmpeg_error(stderr: bytes) -> RuntimeError:
+    """Criar o erro de conversão a partir da saída de erro do ffmpeg."""
+    return RuntimeError(f"Falha ao converter áudio. Você provavelmente precisa instalar o ffmpeg {stderr.decode('utf-8', 'replace')}")
+
+
+def convert_to_opus_ogg(input_file: str, output_file: Optional[str] = None, bitrate: str = "32k", sample_rate: int = 24000, compression_level: int = 7) -> str:
+    """
+    Converter um arquivo de áudio para formato Opus em um contêiner Ogg.
+    
+    Args:
+        input_file (str): Caminho para o arquivo de áudio de entrada
+        output_file (str, optional): Caminho para salvar o arquivo de saída. Se None, substitui a
+                                    extensão do input_file por .ogg
+        bitrate (str, optional): Taxa de bits alvo para codificação Opus (padrão: "32k")
+        sample_rate (int, optional): Taxa de amostragem para a saída (padrão: 24000)
+        compression_level (int, optional): Complexidade do codificador libopus, de 0 a 10 (padrão: 7)
+    
+    Returns:
+        str: Caminho para o arquivo convertido
+        
+    Raises:
+        FileNotFoundError: Se o arquivo de entrada não existir
+        RuntimeError: Se a conversão ffmpeg falhar
+    """
+    output_file = _prepare_output(input_file, output_file)
+    return _encode(input_file, output_file, bitrate, sample_rate, compression_level)
+
+
+def _encode(input_file: str, output_file: str, bitrate: str, sample_rate: int, compression_level: int) -> str:
+    """Converter para Opus/Ogg assumindo que a entrada existe e o diretório de saída também."""
+    # Already a mono Opus/Ogg file: skip the encode entirely
+    if _copy_if_opus_voice(input_file, output_file):
+        return output_file
+    
+    # Encode in-process when PyAV is available, avoiding the ffmpeg process spawn
+    if _PYAV_OPUS:
+        try:
+            with _ffmpeg_pool.acquire():
+                _encode_opus_pyav(input_file, output_file, bitrate, sample_rate, compression_level)
+            return output_file
+        except (av.FFmpegError, ValueError) as e:
+            # ValueError covers PyAV rejecting a stream or option before FFmpeg sees it
+            raise RuntimeError(f"Falha ao converter áudio: {e}")
+    
+    cmd = _ffmpeg_cmd(input_file, output_file, bitrate, sample_rate, compression_level)
     
     try:
         # Run the ffmpeg command and capture output
-        process = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True
-        )
+        _ffmpeg_pool.run(cmd)
         return output_file
     except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Falha ao converter áudio. Você provavelmente precisa instalar o ffmpeg {e.stderr}")
+        raise _ffmpeg_error(e.stderr)
+
+
+async def convert_to_opus_ogg_async(input_file: str, output_file: Optional[str] = None, bitrate: str = "32k", sample_rate: int = 24000, compression_level: int = 7) -> str:
+    """
+    Converter um arquivo de áudio para Opus/Ogg sem bloquear o event loop.
+    
+    Mesmos argumentos, retorno e exceções de convert_to_opus_ogg.
+    """
+    output_file = _prepare_output(input_file, output_file)
+    return await _encode_async(input_file, output_file, bitrate, sample_rate, compression_level)
+
+
+async def _run_in_pool(fn: Callable[..., str], *args: Any) -> str:
+    """Executar uma conversão bloqueante em uma thread do pool sem bloquear o event loop."""
+    conversion = asyncio.get_running_loop().run_in_executor(_ffmpeg_pool.executor, fn, *args)
+    try:
+        return await asyncio.shield(conversion)
+    except asyncio.CancelledError:
+        # The thread can't be interrupted; wait for it so nothing writes the output after we return
+        await asyncio.wait([conversion])
+        raise
+
+
+async def _encode_async(input_file: str, output_file: str, bitrate: str, sample_rate: int, compression_level: int) -> str:
+    """Versão assíncrona de _encode."""
+    # The PyAV encode can't be awaited, so run the whole conversion in a pool thread
+    if _PYAV_OPUS:
+        return await _run_in_pool(_encode, input_file, output_file, bitrate, sample_rate, compression_level)
+    
+    if await asyncio.to_thread(_copy_if_opus_voice, input_file, output_file):
+        return output_file
+    
+    cmd = _ffmpeg_cmd(input_file, output_file, bitrate, sample_rate, compression_level)
+    
+    await _ffmpeg_pool.acquire_async()
+    process: Optional[asyncio.subprocess.Process] = None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        # stdout goes to DEVNULL, so draining stderr until EOF can't deadlock
+        stderr = await process.stderr.read() if process.stderr else b""
+        await process.wait()
+    finally:
+        if process is not None and process.returncode is None:
+            # Cancelled mid-conversion: don't leave ffmpeg running in the background
+            process.kill()
+            await process.wait()
+        _ffmpeg_pool.release()
+    
+    if process.returncode != 0:
+        raise _ffmpeg_error(stderr)
+    return output_file
+
+
+def convert_to_opus_ogg_low_bitrate(input_file: str, output_file: Optional[str] = None, bitrate: str = "12k", compression_level: int = 7) -> str:
+    """
+    Converter um áudio de voz para Opus/Ogg em baixa taxa de bits, passando por PCM μ-law de 8 bits a 16 kHz.
+    
+    A conversão roda em dois processos ffmpeg encadeados por um pipe: o primeiro decodifica
+    e reduz a entrada para μ-law (uma tabela de consulta, quase sem custo) e o segundo
+    codifica em Opus. Cada etapa usa o seu próprio núcleo e o pipe carrega metade dos
+    bytes do PCM de 16 bits. A qualidade fica próxima à de telefone; use convert_to_opus_ogg
+    quando a fidelidade importar.
+    
+    Args:
+        input_file (str): Caminho para o arquivo de áudio de entrada
+        output_file (str, optional): Caminho para salvar o arquivo de saída. Se None, substitui a
+                                    extensão do input_file por .ogg
+        bitrate (str, optional): Taxa de bits alvo para codificação Opus (padrão: "12k")
+        compression_level (int, optional): Complexidade do codificador libopus, de 0 a 10 (padrão: 7)
+    
+    Returns:
+        str: Caminho para o arquivo convertido
+        
+    Raises:
+        FileNotFoundError: Se o arquivo de entrada não existir
+        RuntimeError: Se a conversão ffmpeg falhar
+    """
+    output_file = _prepare_output(input_file, output_file)
+    return _encode_low_bitrate(input_file, output_file, bitrate, compression_level)
+
+
+def _encode_low_bitrate(input_file: str, output_file: str, bitrate: str, compression_level: int) -> str:
+    """Converter pelo pipeline μ-law assumindo que a entrada existe e o diretório de saída também."""
+    if _copy_if_opus_voice(input_file, output_file):
+        return output_file
+    
+    mulaw_format = ("-f", "mulaw", "-ar", str(_MULAW_SAMPLE_RATE), "-ac", "1")
+    decode_cmd = (*_FFMPEG_HEAD, "-i", input_file, "-threads", "1", *mulaw_format, "pipe:1")
+    encode_cmd = (
+        *_FFMPEG_HEAD,
+        *mulaw_format,
+        "-i", "pipe:0",
+        "-b:a", bitrate,
+        "-compression_level", str(compression_level),
+        *_FFMPEG_TAIL,
+        output_file
+    )
+    
+    # Nobody reads the decoder's stderr while the encoder runs, so it goes to a file instead of
+    # a pipe: a corrupt input can log more than a pipe buffer and would block the decoder
+    # Decoder and encoder each keep a core busy, so the pipeline takes two slots
+    with _ffmpeg_pool.acquire(slots=2), tempfile.TemporaryFile() as decoder_log:
+        decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE, stderr=decoder_log)
+        try:
+            encoder = subprocess.run(encode_cmd, stdin=decoder.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        finally:
+            # Close our copy of the pipe so the decoder gets SIGPIPE if the encoder died early
+            if decoder.stdout:
+                decoder.stdout.close()
+            decoder.wait()
+        decoder_log.seek(0)
+        decoder_stderr = decoder_log.read()
+    
+    # A failed encoder makes the decoder die with EPIPE, so its error is the real cause
+    if encoder.returncode != 0:
+        raise _ffmpeg_error(encoder.stderr)
+    if decoder.returncode != 0:
+        raise _ffmpeg_error(decoder_stderr)
+    return output_file
+
+
+def _remove_quietly(path: str) -> None:
+    """Remover um arquivo ignorando o caso em que ele já não existe."""
+    # A single unlink instead of an exists() check followed by unlink()
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
 
 
-def convert_to_opus_ogg_temp(input_file, bitrate="32k", sample_rate=24000):
+def convert_to_opus_ogg_temp(input_file: str, bitrate: str = "32k", sample_rate: int = 24000, compression_level: int = 7) -> str:
     """
     Converter um arquivo de áudio para formato Opus em um contêiner Ogg e armazenar em um arquivo temporário.
     
@@ -69,6 +531,7 @@ def convert_to_opus_ogg_temp(input_file, bitrate="32k", sample_rate=24000):
         input_file (str): Caminho para o arquivo de áudio de entrada
         bitrate (str, optional): Taxa de bits alvo para codificação Opus (padrão: "32k")
         sample_rate (int, optional): Taxa de amostragem para a saída (padrão: 24000)
+        compression_level (int, optional): Complexidade do codificador libopus, de 0 a 10 (padrão: 7)
     
     Returns:
         str: Caminho para o arquivo temporário com o áudio convertido
@@ -77,21 +540,131 @@ def convert_to_opus_ogg_temp(input_file, bitrate="32k", sample_rate=24000):
         FileNotFoundError: Se o arquivo de entrada não existir
         RuntimeError: Se a conversão ffmpeg falhar
     """
-    # Create a temporary file with .ogg extension
-    temp_file = tempfile.NamedTemporaryFile(suffix=".ogg", delete=False)
-    temp_file.close()
+    _check_input(input_file)
+    temp_path = _temp_output_path()
     
     try:
-        # Convert the audio
-        convert_to_opus_ogg(input_file, temp_file.name, bitrate, sample_rate)
-        return temp_file.name
-    except Exception as e:
-        # Clean up the temporary file if conversion fails
-        if os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
+        # Convert the audio straight into the temporary path
+        return _encode(input_file, temp_path, bitrate, sample_rate, compression_level)
+    except BaseException as e:
+        # Clean up a partially written file if conversion fails
+        _remove_quietly(temp_path)
         raise e
 
 
+def convert_to_opus_ogg_low_bitrate_temp(input_file: str, bitrate: str = "12k", compression_level: int = 7) -> str:
+    """
+    Converter um áudio de voz pelo pipeline μ-law de convert_to_opus_ogg_low_bitrate e armazenar em um arquivo temporário.
+    
+    Args:
+        input_file (str): Caminho para o arquivo de áudio de entrada
+        bitrate (str, optional): Taxa de bits alvo para codificação Opus (padrão: "12k")
+        compression_level (int, optional): Complexidade do codificador libopus, de 0 a 10 (padrão: 7)
+    
+    Returns:
+        str: Caminho para o arquivo temporário com o áudio convertido
+        
+    Raises:
+        FileNotFoundError: Se o arquivo de entrada não existir
+        RuntimeError: Se a conversão ffmpeg falhar
+    """
+    _check_input(input_file)
+    temp_path = _temp_output_path()
+    
+    try:
+        return _encode_low_bitrate(input_file, temp_path, bitrate, compression_level)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+
+
+async def convert_to_opus_ogg_low_bitrate_temp_async(input_file: str, bitrate: str = "12k", compression_level: int = 7) -> str:
+    """
+    Converter um áudio de voz pelo pipeline μ-law em um arquivo temporário sem bloquear o event loop.
+    
+    Mesmos argumentos, retorno e exceções de convert_to_opus_ogg_low_bitrate_temp.
+    """
+    _check_input(input_file)
+    temp_path = _temp_output_path()
+    
+    try:
+        return await _run_in_pool(_encode_low_bitrate, input_file, temp_path, bitrate, compression_level)
+    except BaseException:
+        # Cancellation included: by now no encoder is still writing the file
+        _remove_quietly(temp_path)
+        raise
+
+
+async def convert_to_opus_ogg_temp_async(input_file: str, bitrate: str = "32k", sample_rate: int = 24000, compression_level: int = 7) -> str:
+    """
+    Converter um arquivo de áudio para Opus/Ogg em um arquivo temporário sem bloquear o event loop.
+    
+    Mesmos argumentos, retorno e exceções de convert_to_opus_ogg_temp.
+    """
+    _check_input(input_file)
+    temp_path = _temp_output_path()
+    
+    try:
+        return await _encode_async(input_file, temp_path, bitrate, sample_rate, compression_level)
+    except BaseException:
+        # Cancellation included: by now no encoder is still writing the file
+        _remove_quietly(temp_path)
+        raise
+
+
+def convert_many_to_opus_ogg(paths: List[str], bitrate: Optional[str] = None, sample_rate: int = 24000, compression_level: int = 7, low_bitrate: bool = False) -> List[str]:
+    """
+    Converter vários arquivos de áudio para Opus/Ogg em paralelo, um núcleo por arquivo.
+    
+    Args:
+        paths (list[str]): Caminhos para os arquivos de áudio de entrada
+        bitrate (str, optional): Taxa de bits alvo para codificação Opus (padrão: "32k", ou "12k" com low_bitrate)
+        sample_rate (int, optional): Taxa de amostragem para a saída (padrão: 24000); ignorada com low_bitrate
+        compression_level (int, optional): Complexidade do codificador libopus, de 0 a 10 (padrão: 7)
+        low_bitrate (bool, optional): Se True, converte pelo pipeline μ-law de convert_to_opus_ogg_low_bitrate (padrão: False)
+    
+    Returns:
+        list[str]: Caminhos para os arquivos temporários convertidos, na mesma ordem da entrada
+        
+    Raises:
+        FileNotFoundError: Se algum arquivo de entrada não existir
+        RuntimeError: Se alguma conversão ffmpeg falhar
+    """
+    if not paths:
+        return []
+    
+    # The encoders run outside the GIL (ffmpeg subprocess or PyAV), so threads are enough
+    # A low-bitrate conversion takes two slots, so only half as many fit at once
+    workers = max(1, _ffmpeg_pool.size // 2) if low_bitrate else _ffmpeg_pool.size
+    with ThreadPoolExecutor(max_workers=min(len(paths), workers)) as executor:
+        if low_bitrate:
+            futures = [
+                executor.submit(convert_to_opus_ogg_low_bitrate_temp, path, bitrate or "12k", compression_level)
+                for path in paths
+            ]
+        else:
+            futures = [
+                executor.submit(convert_to_opus_ogg_temp, path, bitrate or "32k", sample_rate, compression_level)
+                for path in paths
+            ]
+    
+    results = []
+    error = None
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            error = error or e
+    
+    if error is not None:
+        # Don't leak the temporary files of the conversions that succeeded
+        for result in results:
+            _remove_quietly(result)
+        raise error
+    
+    return results
+
+
 if __name__ == "__main__":
     # Example usage
     import sys
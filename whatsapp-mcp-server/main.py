@@ -1,5 +1,16 @@
-from typing import List, Dict, Any, Optional
+import asyncio
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import fields
+from typing import List, Dict, Any, Callable, Optional, Sequence
+import pydantic_core
 from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp.utilities.func_metadata import func_metadata
 from whatsapp import (
     search_contacts as whatsapp_search_contacts,
     list_messages as whatsapp_list_messages,
@@ -11,25 +22,124 @@ from whatsapp import (
     get_message_context as whatsapp_get_message_context,
     send_message as whatsapp_send_message,
     send_file as whatsapp_send_file,
-    send_audio_message as whatsapp_audio_voice_message,
-    download_media as whatsapp_download_media
+    send_audio_message_async as whatsapp_audio_voice_message_async,
+    send_audio_messages as whatsapp_audio_voice_messages,
+    download_media as whatsapp_download_media,
+    Chat,
+    Contact
 )
 
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; without it responses are serialized the same way FastMCP does
+    orjson = None
+
 # Initialize FastMCP server
 mcp = FastMCP("whatsapp")
 
+CHAT_COLUMNS = [field.name for field in fields(Chat)]
+CONTACT_COLUMNS = [field.name for field in fields(Contact)]
+
+def _aos_to_soa(rows: Sequence[Any], keys: List[str]) -> Dict[str, Any]:
+    """Converter uma lista de registros em colunas, uma lista de valores por campo.
+    
+    FastMCP serializa cada item de uma lista como um conteúdo separado; em colunas
+    a resposta vira um único objeto JSON com cada nome de campo emitido uma vez.
+    """
+    columns: Dict[str, Any] = {"_columns": keys}
+    for key in keys:
+        columns[key] = [getattr(row, key) for row in rows]
+    return columns
+
+def _ttl_cache(ttl: float, maxsize: int = 1024, is_valid: Callable[[Any], bool] = lambda value: value is not None):
+    """Memorizar as respostas de uma função de leitura por `ttl` segundos, em um LRU de até `maxsize` entradas.
+    
+    Agentes costumam repetir a mesma consulta; dentro da janela a resposta sai da
+    memória sem voltar ao SQLite ou à ponte. Valores rejeitados por `is_valid` (por
+    padrão, None) não são guardados nem devolvidos do cache.
+    """
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        entries: OrderedDict = OrderedDict()
+        lock = threading.Lock()
+        
+        @functools.wraps(fn)
+        def wrapper(*args: Any) -> Any:
+            now = time.monotonic()
+            with lock:
+                entry = entries.get(args)
+                if entry is not None and entry[0] > now and is_valid(entry[1]):
+                    entries.move_to_end(args)
+                    return entry[1]
+            
+            value = fn(*args)
+            if is_valid(value):
+                with lock:
+                    entries[args] = (now + ttl, value)
+                    entries.move_to_end(args)
+                    if len(entries) > maxsize:
+                        entries.popitem(last=False)
+            return value
+        
+        return wrapper
+    return decorator
+
+# WhatsApp data changes constantly, so reads are only reused for a few seconds
+_cached_get_chat = _ttl_cache(ttl=5.0)(whatsapp_get_chat)
+_cached_get_last_interaction = _ttl_cache(ttl=5.0)(whatsapp_get_last_interaction)
+_cached_get_message_context = _ttl_cache(ttl=5.0)(whatsapp_get_message_context)
+# Downloaded media doesn't change; reuse the path for as long as the file still exists
+_cached_download_media = _ttl_cache(
+    ttl=300.0,
+    is_valid=lambda file_path: file_path is not None and os.path.exists(file_path)
+)(whatsapp_download_media)
+
+# A bare phone number, or any user[.agent][:device]@server JID the bridge's ParseJID accepts on a
+# known server; list_chats also returns @lid, @newsletter and @broadcast chats
+RECIPIENT_PATTERN = re.compile(r"[0-9]{5,15}|[^@:\s]+(:[0-9]+)?@(s\.whatsapp\.net|g\.us|lid|newsletter|broadcast)")
+
+def _validate_recipient(recipient: str) -> Optional[Dict[str, Any]]:
+    """Retornar a resposta de erro se o destinatário estiver vazio ou malformado, ou None se for válido.
+    
+    Rejeita a entrada já no servidor MCP, sem a ida e volta até a ponte.
+    """
+    if not recipient:
+        return {
+            "success": False,
+            "message": "O destinatário deve ser fornecido"
+        }
+    if not RECIPIENT_PATTERN.fullmatch(recipient):
+        return {
+            "success": False,
+            "message": f"Destinatário inválido: {recipient}. Use um número de telefone com código do país (apenas dígitos) ou um JID como \"123456789@s.whatsapp.net\", \"123456789@g.us\" ou \"123456789@lid\""
+        }
+    return None
+
+def _to_json(result: Any) -> str:
+    """Serializar a resposta de uma ferramenta em JSON, usando orjson quando disponível.
+    
+    Strings são repassadas pelo FastMCP sem nova serialização, e o orjson codifica
+    dataclasses e datetimes nativamente, sem percorrer o resultado em Python.
+    """
+    if orjson is not None:
+        return orjson.dumps(result, option=orjson.OPT_UTC_Z).decode()
+    return json.dumps(pydantic_core.to_jsonable_python(result))
+
 @mcp.tool()
-def search_contacts(query: str) -> List[Dict[str, Any]]:
+async def search_contacts(query: str) -> str:
     """Buscar contatos do WhatsApp por nome ou número de telefone.
     
     Args:
         query: Termo de busca para corresponder a nomes de contatos ou números de telefone
+    
+    Returns:
+        Os contatos em formato colunar: "_columns" lista os campos e cada campo contém uma lista de valores, alinhados por índice
     """
-    contacts = whatsapp_search_contacts(query)
-    return contacts
+    contacts = await asyncio.to_thread(whatsapp_search_contacts, query)
+    return _to_json(_aos_to_soa(contacts, CONTACT_COLUMNS))
 
 @mcp.tool()
-def list_messages(
+async def list_messages(
     after: Optional[str] = None,
     before: Optional[str] = None,
     sender_phone_number: Optional[str] = None,
@@ -55,7 +165,8 @@ def list_messages(
         context_before: Número de mensagens a incluir antes de cada correspondência (padrão 1)
         context_after: Número de mensagens a incluir depois de cada correspondência (padrão 1)
     """
-    messages = whatsapp_list_messages(
+    messages = await asyncio.to_thread(
+        whatsapp_list_messages,
         after=after,
         before=before,
         sender_phone_number=sender_phone_number,
@@ -64,19 +175,18 @@ def list_messages(
         limit=limit,
         page=page,
         include_context=include_context,
-        context_before=context_before,
-        context_after=context_after
+        context_window=(context_before, context_after)
     )
     return messages
 
 @mcp.tool()
-def list_chats(
+async def list_chats(
     query: Optional[str] = None,
     limit: int = 20,
     page: int = 0,
     include_last_message: bool = True,
     sort_by: str = "last_active"
-) -> List[Dict[str, Any]]:
+) -> str:
     """Obter conversas do WhatsApp que correspondem aos critérios especificados.
     
     Args:
@@ -85,65 +195,72 @@ def list_chats(
         page: Número da página para paginação (padrão 0)
         include_last_message: Se deve incluir a última mensagem em cada conversa (padrão True)
         sort_by: Campo para ordenar os resultados, "last_active" ou "name" (padrão "last_active")
+    
+    Returns:
+        As conversas em formato colunar: "_columns" lista os campos e cada campo contém uma lista de valores, alinhados por índice
     """
-    chats = whatsapp_list_chats(
+    chats = await asyncio.to_thread(
+        whatsapp_list_chats,
         query=query,
         limit=limit,
         page=page,
         include_last_message=include_last_message,
         sort_by=sort_by
     )
-    return chats
+    return _to_json(_aos_to_soa(chats, CHAT_COLUMNS))
 
 @mcp.tool()
-def get_chat(chat_jid: str, include_last_message: bool = True) -> Dict[str, Any]:
+async def get_chat(chat_jid: str, include_last_message: bool = True) -> str:
     """Obter metadados da conversa do WhatsApp por JID.
     
     Args:
         chat_jid: O JID da conversa a ser recuperada
         include_last_message: Se deve incluir a última mensagem (padrão True)
     """
-    chat = whatsapp_get_chat(chat_jid, include_last_message)
-    return chat
+    chat = await asyncio.to_thread(_cached_get_chat, chat_jid, include_last_message)
+    return _to_json(chat)
 
 @mcp.tool()
-def get_direct_chat_by_contact(sender_phone_number: str) -> Dict[str, Any]:
+async def get_direct_chat_by_contact(sender_phone_number: str) -> str:
     """Obter metadados da conversa do WhatsApp por número de telefone do remetente.
     
     Args:
         sender_phone_number: O número de telefone a ser pesquisado
     """
-    chat = whatsapp_get_direct_chat_by_contact(sender_phone_number)
-    return chat
+    chat = await asyncio.to_thread(whatsapp_get_direct_chat_by_contact, sender_phone_number)
+    return _to_json(chat)
 
 @mcp.tool()
-def get_contact_chats(jid: str, limit: int = 20, page: int = 0) -> List[Dict[str, Any]]:
+async def get_contact_chats(jid: str, limit: int = 20, page: int = 0) -> str:
     """Obter todas as conversas do WhatsApp envolvendo o contato.
     
     Args:
         jid: O JID do contato a ser pesquisado
         limit: Número máximo de conversas a retornar (padrão 20)
         page: Número da página para paginação (padrão 0)
+    
+    Returns:
+        As conversas em formato colunar: "_columns" lista os campos e cada campo contém uma lista de valores, alinhados por índice
     """
-    chats = whatsapp_get_contact_chats(jid, limit, page)
-    return chats
+    chats = await asyncio.to_thread(whatsapp_get_contact_chats, jid, limit, page)
+    return _to_json(_aos_to_soa(chats, CHAT_COLUMNS))
 
 @mcp.tool()
-def get_last_interaction(jid: str) -> str:
+async def get_last_interaction(jid: str) -> str:
     """Obter a mensagem mais recente do WhatsApp envolvendo o contato.
     
     Args:
         jid: O JID do contato a ser pesquisado
     """
-    message = whatsapp_get_last_interaction(jid)
+    message = await asyncio.to_thread(_cached_get_last_interaction, jid)
     return message
 
 @mcp.tool()
-def get_message_context(
+async def get_message_context(
     message_id: str,
     before: int = 5,
     after: int = 5
-) -> Dict[str, Any]:
+) -> str:
     """Obter contexto ao redor de uma mensagem específica do WhatsApp.
     
     Args:
@@ -151,11 +268,11 @@ def get_message_context(
         before: Número de mensagens a incluir antes da mensagem alvo (padrão 5)
         after: Número de mensagens a incluir depois da mensagem alvo (padrão 5)
     """
-    context = whatsapp_get_message_context(message_id, before, after)
-    return context
+    context = await asyncio.to_thread(_cached_get_message_context, message_id, before, after)
+    return _to_json(context)
 
 @mcp.tool()
-def send_message(
+async def send_message(
     recipient: str,
     message: str
 ) -> Dict[str, Any]:
@@ -170,21 +287,19 @@ def send_message(
         Um dicionário contendo o status de sucesso e uma mensagem de status
     """
     # Validar entrada
-    if not recipient:
-        return {
-            "success": False,
-            "message": "O destinatário deve ser fornecido"
-        }
+    error = _validate_recipient(recipient)
+    if error:
+        return error
     
     # Chamar a função whatsapp_send_message com o parâmetro unificado recipient
-    success, status_message = whatsapp_send_message(recipient, message)
+    success, status_message = await asyncio.to_thread(whatsapp_send_message, recipient, message)
     return {
         "success": success,
         "message": status_message
     }
 
 @mcp.tool()
-def send_file(recipient: str, media_path: str) -> Dict[str, Any]:
+async def send_file(recipient: str, media_path: str) -> Dict[str, Any]:
     """Enviar um arquivo como imagem, áudio bruto, vídeo ou documento via WhatsApp para o destinatário especificado. Para mensagens em grupo, use o JID.
     
     Args:
@@ -195,34 +310,51 @@ def send_file(recipient: str, media_path: str) -> Dict[str, Any]:
     Returns:
         Um dicionário contendo o status de sucesso e uma mensagem de status
     """
+    error = _validate_recipient(recipient)
+    if error:
+        return error
     
     # Chamar a função whatsapp_send_file
-    success, status_message = whatsapp_send_file(recipient, media_path)
+    success, status_message = await asyncio.to_thread(whatsapp_send_file, recipient, media_path)
     return {
         "success": success,
         "message": status_message
     }
 
 @mcp.tool()
-def send_audio_message(recipient: str, media_path: str) -> Dict[str, Any]:
+async def send_audio_message(
+    recipient: str,
+    media_path: Optional[str] = None,
+    media_paths: Optional[List[str]] = None,
+    low_bitrate: bool = False
+) -> Dict[str, Any]:
     """Enviar qualquer arquivo de áudio como uma mensagem de áudio do WhatsApp para o destinatário especificado. Para mensagens em grupo, use o JID. Se houver erro devido ao ffmpeg não estar instalado, use send_file em vez disso.
     
     Args:
         recipient: O destinatário - pode ser um número de telefone com código do país mas sem + ou outros símbolos,
                  ou um JID (por exemplo, "123456789@s.whatsapp.net" ou um JID de grupo como "123456789@g.us")
         media_path: O caminho absoluto para o arquivo de áudio a enviar (será convertido para Opus .ogg se não for um arquivo .ogg)
+        media_paths: Lista opcional de caminhos absolutos para enviar vários áudios de uma vez (convertidos em paralelo)
+        low_bitrate: Se deve converter em taxa de bits muito baixa, com qualidade próxima à de telefone, para economizar dados (padrão False)
     
     Returns:
         Um dicionário contendo o status de sucesso e uma mensagem de status
     """
-    success, status_message = whatsapp_audio_voice_message(recipient, media_path)
+    error = _validate_recipient(recipient)
+    if error:
+        return error
+    
+    if media_paths:
+        success, status_message = await asyncio.to_thread(whatsapp_audio_voice_messages, recipient, media_paths, low_bitrate)
+    else:
+        success, status_message = await whatsapp_audio_voice_message_async(recipient, media_path, low_bitrate)
     return {
         "success": success,
         "message": status_message
     }
 
 @mcp.tool()
-def download_media(message_id: str, chat_jid: str) -> Dict[str, Any]:
+async def download_media(message_id: str, chat_jid: str) -> Dict[str, Any]:
     """Baixar mídia de uma mensagem do WhatsApp e obter o caminho do arquivo local.
     
     Args:
@@ -232,7 +364,7 @@ def download_media(message_id: str, chat_jid: str) -> Dict[str, Any]:
     Returns:
         Um dicionário contendo o status de sucesso, uma mensagem de status e o caminho do arquivo se bem-sucedido
     """
-    file_path = whatsapp_download_media(message_id, chat_jid)
+    file_path = await asyncio.to_thread(_cached_download_media, message_id, chat_jid)
     
     if file_path:
         return {
@@ -246,6 +378,55 @@ def download_media(message_id: str, chat_jid: str) -> Dict[str, Any]:
             "message": "Falha ao baixar a mídia"
         }
 
+# Each tool with the same argument model FastMCP validates direct calls against
+BATCH_TOOLS = {
+    tool.__name__: (tool, func_metadata(tool))
+    for tool in (
+        search_contacts,
+        list_messages,
+        list_chats,
+        get_chat,
+        get_direct_chat_by_contact,
+        get_contact_chats,
+        get_last_interaction,
+        get_message_context,
+        send_message,
+        send_file,
+        send_audio_message,
+        download_media,
+    )
+}
+
+@mcp.tool()
+async def batch(tool_calls: List[Dict[str, Any]]) -> List[Any]:
+    """Executar várias ferramentas do WhatsApp em uma única chamada, em ordem.
+    
+    Args:
+        tool_calls: Lista de chamadas, cada uma no formato {"tool": "nome_da_ferramenta", "arguments": {...}},
+                    por exemplo [{"tool": "list_chats", "arguments": {"limit": 5}}, {"tool": "get_chat", "arguments": {"chat_jid": "123456789@s.whatsapp.net"}}]
+    
+    Returns:
+        Um resultado por chamada, na mesma ordem; chamadas que falharem retornam um dicionário com "error"
+    """
+    results = []
+    for call in tool_calls:
+        name = call.get("tool")
+        if name not in BATCH_TOOLS:
+            results.append({"tool": name, "error": f"Ferramenta desconhecida: {name}"})
+            continue
+        
+        tool, metadata = BATCH_TOOLS[name]
+        try:
+            # Validate and coerce the arguments exactly like a direct call would
+            result = await metadata.call_fn_with_arg_validation(tool, True, call.get("arguments") or {}, None)
+        except Exception as e:
+            results.append({"tool": name, "error": str(e)})
+            continue
+        
+        # FastMCP drops None from list results, which would shift the remaining results
+        results.append(_to_json(None) if result is None else result)
+    return results
+
 if __name__ == "__main__":
-    # Initialize and run the server
-    mcp.run(transport='stdio')
\ No newline at end of file
+    # Initialize and run the server; MCP_TRANSPORT=sse serves over HTTP instead of stdio
+    mcp.run(transport=os.getenv("MCP_TRANSPORT", "stdio"))
\ No newline at end of file
@@ -1,7 +1,9 @@
+import asyncio
 import sqlite3
+import threading
 from datetime import datetime
 from dataclasses import dataclass
-from typing import Optional, List, Tuple
+from typing import Iterator, Optional, List, Tuple
 import os
 import os.path
 import requests
@@ -11,6 +13,8 @@ import audio
 MESSAGES_DB_PATH = os.getenv("MESSAGES_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'whatsapp-bridge', 'store', 'messages.db'))
 WHATSAPP_API_BASE_URL = os.getenv("WHATSAPP_API_BASE_URL", "http://localhost:8080/api")
 
+_local = threading.local()
+
 @dataclass
 class Message:
     timestamp: datetime
@@ -48,9 +52,31 @@ class MessageContext:
     before: List[Message]
     after: List[Message]
 
+def connect() -> sqlite3.Connection:
+    """Obter a conexão SQLite desta thread, abrindo-a na primeira chamada.
+    
+    As ferramentas rodam em threads de trabalho; cada thread mantém a sua conexão
+    aberta em vez de reabrir o banco a cada consulta.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(MESSAGES_DB_PATH)
+        # Serve reads straight from the memory-mapped database file
+        conn.execute("PRAGMA mmap_size=268435456")
+        _local.conn = conn
+    return conn
+
+def _iter_rows(cursor: sqlite3.Cursor, chunk_size: int = 64) -> Iterator[tuple]:
+    """Percorrer o resultado de uma consulta em blocos, sem materializar todas as linhas com fetchall()."""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
 def get_sender_name(sender_jid: str) -> str:
     try:
-        conn = sqlite3.connect(MESSAGES_DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         # First try matching by exact JID
@@ -89,8 +115,8 @@ def get_sender_name(sender_jid: str) -> str:
         print(f"Erro no banco de dados ao obter nome do remetente: {e}")
         return sender_jid
     finally:
-        if 'conn' in locals():
-            conn.close()
+        if 'cursor' in locals():
+            cursor.close()
 
 def format_message(message: Message, show_chat_info: bool = True) -> None:
     """Imprimir uma única mensagem com formatação consistente."""
@@ -131,12 +157,14 @@ def list_messages(
     limit: int = 20,
     page: int = 0,
     include_context: bool = True,
-    context_before: int = 1,
-    context_after: int = 1
+    context_window: Tuple[int, int] = (1, 1)
 ) -> List[Message]:
-    """Obter mensagens que correspondem aos critérios especificados com contexto opcional."""
+    """Obter mensagens que correspondem aos critérios especificados com contexto opcional.
+    
+    `context_window` é o par (mensagens antes, mensagens depois) incluído ao redor de cada correspondência.
+    """
     try:
-        conn = sqlite3.connect(MESSAGES_DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         # Build base query
@@ -186,7 +214,7 @@ def list_messages(
         params.extend([limit, offset])
         
         cursor.execute(" ".join(query_parts), tuple(params))
-        messages = cursor.fetchall()
+        messages = _iter_rows(cursor)
         
         result = []
         for msg in messages:
@@ -203,14 +231,9 @@ def list_messages(
             result.append(message)
             
         if include_context and result:
-            # Add context for each message
-            messages_with_context = []
-            for msg in result:
-                context = get_message_context(msg.id, context_before, context_after)
-                messages_with_context.extend(context.before)
-                messages_with_context.append(context.message)
-                messages_with_context.extend(context.after)
-            
+            # Fetch the context of every match in one windowed query
+            context_before, context_after = context_window
+            messages_with_context = _fetch_context_windows(cursor, result, context_before, context_after)
             return format_messages_list(messages_with_context, show_chat_info=True)
             
         # Format and display messages without context
@@ -220,8 +243,89 @@ def list_messages(
         print(f"Erro no banco de dados: {e}")
         return []
     finally:
-        if 'conn' in locals():
-            conn.close()
+        if 'cursor' in locals():
+            cursor.close()
+
+
+def _fetch_context_windows(
+    cursor: sqlite3.Cursor,
+    matches: List[Message],
+    before: int,
+    after: int
+) -> List[Message]:
+    """Obter cada mensagem com as vizinhas da mesma conversa em uma única consulta.
+    
+    Como em get_message_context, as vizinhas são as mensagens da conversa com horário
+    estritamente anterior ou posterior ao da correspondência. Cada lado é escolhido por
+    uma subconsulta com ORDER BY ... LIMIT, que guarda só as mais próximas em vez de
+    numerar a conversa inteira. A ordem também é a mesma: anteriores da mais próxima
+    para a mais distante, a mensagem, e as posteriores. Mensagens com o mesmo horário seguem a
+    ordem de inserção no banco.
+    """
+    match_rows = ", ".join("(?, ?, ?)" for _ in matches)
+    params = []
+    for order, match in enumerate(matches):
+        params.extend([match.id, match.chat_jid, order])
+    params.extend([before, after])
+    
+    cursor.execute(f"""
+        WITH matches(id, chat_jid, match_order) AS (VALUES {match_rows}),
+        targets AS (
+            SELECT matches.match_order, messages.timestamp, messages.sender, chats.name, messages.content, messages.is_from_me, chats.jid, messages.id, messages.media_type
+            FROM matches
+            JOIN messages ON messages.id = matches.id AND messages.chat_jid = matches.chat_jid
+            JOIN chats ON messages.chat_jid = chats.jid
+        ),
+        before_rows AS (
+            SELECT targets.match_order, messages.timestamp, messages.sender, chats.name, messages.content, messages.is_from_me, chats.jid, messages.id, messages.media_type,
+                ROW_NUMBER() OVER (PARTITION BY targets.match_order ORDER BY messages.timestamp DESC, messages.rowid) AS distance
+            FROM targets
+            JOIN messages ON messages.rowid IN (
+                SELECT earlier.rowid
+                FROM messages AS earlier
+                WHERE earlier.chat_jid = targets.jid AND earlier.timestamp < targets.timestamp
+                ORDER BY earlier.timestamp DESC, earlier.rowid
+                LIMIT ?
+            )
+            JOIN chats ON messages.chat_jid = chats.jid
+        ),
+        after_rows AS (
+            SELECT targets.match_order, messages.timestamp, messages.sender, chats.name, messages.content, messages.is_from_me, chats.jid, messages.id, messages.media_type,
+                ROW_NUMBER() OVER (PARTITION BY targets.match_order ORDER BY messages.timestamp ASC, messages.rowid) AS distance
+            FROM targets
+            JOIN messages ON messages.rowid IN (
+                SELECT later.rowid
+                FROM messages AS later
+                WHERE later.chat_jid = targets.jid AND later.timestamp > targets.timestamp
+                ORDER BY later.timestamp ASC, later.rowid
+                LIMIT ?
+            )
+            JOIN chats ON messages.chat_jid = chats.jid
+        )
+        SELECT timestamp, sender, name, content, is_from_me, jid, id, media_type
+        FROM (
+            SELECT 0 AS side, * FROM before_rows
+            UNION ALL
+            SELECT 1 AS side, *, 0 AS distance FROM targets
+            UNION ALL
+            SELECT 2 AS side, * FROM after_rows
+        )
+        ORDER BY match_order, side, distance
+    """, tuple(params))
+    
+    return [
+        Message(
+            timestamp=datetime.fromisoformat(msg[0]),
+            sender=msg[1],
+            chat_name=msg[2],
+            content=msg[3],
+            is_from_me=msg[4],
+            chat_jid=msg[5],
+            id=msg[6],
+            media_type=msg[7]
+        )
+        for msg in _iter_rows(cursor)
+    ]
 
 
 def get_message_context(
@@ -231,7 +335,7 @@ def get_message_context(
 ) -> MessageContext:
     """Obter contexto ao redor de uma mensagem específica."""
     try:
-        conn = sqlite3.connect(MESSAGES_DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         # Get the target message first
@@ -268,7 +372,7 @@ def get_message_context(
         """, (msg_data[7], msg_data[0], before))
         
         before_messages = []
-        for msg in cursor.fetchall():
+        for msg in _iter_rows(cursor):
             before_messages.append(Message(
                 timestamp=datetime.fromisoformat(msg[0]),
                 sender=msg[1],
@@ -291,7 +395,7 @@ def get_message_context(
         """, (msg_data[7], msg_data[0], after))
         
         after_messages = []
-        for msg in cursor.fetchall():
+        for msg in _iter_rows(cursor):
             after_messages.append(Message(
                 timestamp=datetime.fromisoformat(msg[0]),
                 sender=msg[1],
@@ -313,8 +417,8 @@ def get_message_context(
         print(f"Erro no banco de dados: {e}")
         raise
     finally:
-        if 'conn' in locals():
-            conn.close()
+        if 'cursor' in locals():
+            cursor.close()
 
 
 def list_chats(
@@ -326,7 +430,7 @@ def list_chats(
 ) -> List[Chat]:
     """Obter conversas que correspondem aos critérios especificados."""
     try:
-        conn = sqlite3.connect(MESSAGES_DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         # Build base query
@@ -367,7 +471,7 @@ def list_chats(
         params.extend([limit, offset])
         
         cursor.execute(" ".join(query_parts), tuple(params))
-        chats = cursor.fetchall()
+        chats = _iter_rows(cursor)
         
         result = []
         for chat_data in chats:
@@ -387,14 +491,14 @@ def list_chats(
         print(f"Erro no banco de dados: {e}")
         return []
     finally:
-        if 'conn' in locals():
-            conn.close()
+        if 'cursor' in locals():
+            cursor.close()
 
 
 def search_contacts(query: str) -> List[Contact]:
     """Buscar contatos por nome ou número de telefone."""
     try:
-        conn = sqlite3.connect(MESSAGES_DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         # Split query into characters to support partial matching
@@ -412,7 +516,7 @@ def search_contacts(query: str) -> List[Contact]:
             LIMIT 50
         """, (search_pattern, search_pattern))
         
-        contacts = cursor.fetchall()
+        contacts = _iter_rows(cursor)
         
         result = []
         for contact_data in contacts:
@@ -429,8 +533,8 @@ def search_contacts(query: str) -> List[Contact]:
         print(f"Erro no banco de dados: {e}")
         return []
     finally:
-        if 'conn' in locals():
-            conn.close()
+        if 'cursor' in locals():
+            cursor.close()
 
 
 def get_contact_chats(jid: str, limit: int = 20, page: int = 0) -> List[Chat]:
@@ -442,7 +546,7 @@ def get_contact_chats(jid: str, limit: int = 20, page: int = 0) -> List[Chat]:
         page: Número da página para paginação (padrão 0)
     """
     try:
-        conn = sqlite3.connect(MESSAGES_DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -460,7 +564,7 @@ def get_contact_chats(jid: str, limit: int = 20, page: int = 0) -> List[Chat]:
             LIMIT ? OFFSET ?
         """, (jid, jid, limit, page * limit))
         
-        chats = cursor.fetchall()
+        chats = _iter_rows(cursor)
         
         result = []
         for chat_data in chats:
@@ -480,14 +584,14 @@ def get_contact_chats(jid: str, limit: int = 20, page: int = 0) -> List[Chat]:
         print(f"Erro no banco de dados: {e}")
         return []
     finally:
-        if 'conn' in locals():
-            conn.close()
+        if 'cursor' in locals():
+            cursor.close()
 
 
 def get_last_interaction(jid: str) -> str:
     """Obter a mensagem mais recente envolvendo o contato."""
     try:
-        conn = sqlite3.connect(MESSAGES_DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -529,14 +633,14 @@ def get_last_interaction(jid: str) -> str:
         print(f"Erro no banco de dados: {e}")
         return None
     finally:
-        if 'conn' in locals():
-            conn.close()
+        if 'cursor' in locals():
+            cursor.close()
 
 
 def get_chat(chat_jid: str, include_last_message: bool = True) -> Optional[Chat]:
     """Obter metadados da conversa por JID."""
     try:
-        conn = sqlite3.connect(MESSAGES_DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         query = """
@@ -577,14 +681,14 @@ def get_chat(chat_jid: str, include_last_message: bool = True) -> Optional[Chat]
         print(f"Erro no banco de dados: {e}")
         return None
     finally:
-        if 'conn' in locals():
-            conn.close()
+        if 'cursor' in locals():
+            cursor.close()
 
 
 def get_direct_chat_by_contact(sender_phone_number: str) -> Optional[Chat]:
     """Obter metadados da conversa por número de telefone do remetente."""
     try:
-        conn = sqlite3.connect(MESSAGES_DB_PATH)
+        conn = connect()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -620,8 +724,8 @@ def get_direct_chat_by_contact(sender_phone_number: str) -> Optional[Chat]:
         print(f"Erro no banco de dados: {e}")
         return None
     finally:
-        if 'conn' in locals():
-            conn.close()
+        if 'cursor' in locals():
+            cursor.close()
 
 def send_message(recipient: str, message: str) -> Tuple[bool, str]:
     try:
@@ -685,7 +789,17 @@ def send_file(recipient: str, media_path: str) -> Tuple[bool, str]:
     except Exception as e:
         return False, f"Erro inesperado: {str(e)}"
 
-def send_audio_message(recipient: str, media_path: str) -> Tuple[bool, str]:
+def _remove_converted_audio(path: Optional[str]) -> None:
+    """Remover o .ogg temporário de uma conversão depois que a ponte já o enviou."""
+    # /send only answers after the bridge has read and uploaded the file
+    if path:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+def send_audio_message(recipient: str, media_path: str, low_bitrate: bool = False) -> Tuple[bool, str]:
+    converted_path = None
     try:
         # Validate input
         if not recipient:
@@ -699,7 +813,10 @@ def send_audio_message(recipient: str, media_path: str) -> Tuple[bool, str]:
 
         if not media_path.endswith(".ogg"):
             try:
-                media_path = audio.convert_to_opus_ogg_temp(media_path)
+                if low_bitrate:
+                    media_path = converted_path = audio.convert_to_opus_ogg_low_bitrate_temp(media_path)
+                else:
+                    media_path = converted_path = audio.convert_to_opus_ogg_temp(media_path)
             except Exception as e:
                 return False, f"Erro ao converter arquivo para opus ogg. Você provavelmente precisa instalar o ffmpeg: {str(e)}"
         
@@ -724,6 +841,68 @@ def send_audio_message(recipient: str, media_path: str) -> Tuple[bool, str]:
         return False, f"Erro ao analisar resposta: {response.text}"
     except Exception as e:
         return False, f"Erro inesperado: {str(e)}"
+    finally:
+        _remove_converted_audio(converted_path)
+
+async def send_audio_message_async(recipient: str, media_path: str, low_bitrate: bool = False) -> Tuple[bool, str]:
+    """Enviar um arquivo de áudio como mensagem de voz sem bloquear o event loop durante a conversão."""
+    if not recipient:
+        return False, "O destinatário deve ser fornecido"
+    
+    if not media_path:
+        return False, "O caminho da mídia deve ser fornecido"
+    
+    if not os.path.isfile(media_path):
+        return False, f"Arquivo de mídia não encontrado: {media_path}"
+    
+    converted_path = None
+    if not media_path.endswith(".ogg"):
+        try:
+            if low_bitrate:
+                media_path = converted_path = await audio.convert_to_opus_ogg_low_bitrate_temp_async(media_path)
+            else:
+                media_path = converted_path = await audio.convert_to_opus_ogg_temp_async(media_path)
+        except Exception as e:
+            return False, f"Erro ao converter arquivo para opus ogg. Você provavelmente precisa instalar o ffmpeg: {str(e)}"
+    
+    try:
+        # The file is .ogg by now, so this only performs the (blocking) HTTP request
+        return await asyncio.to_thread(send_audio_message, recipient, media_path)
+    finally:
+        _remove_converted_audio(converted_path)
+
+def send_audio_messages(recipient: str, media_paths: List[str], low_bitrate: bool = False) -> Tuple[bool, str]:
+    """Enviar vários arquivos de áudio como mensagens de voz, convertendo-os em paralelo."""
+    if not recipient:
+        return False, "O destinatário deve ser fornecido"
+    
+    if not media_paths:
+        return False, "Os caminhos das mídias devem ser fornecidos"
+    
+    for media_path in media_paths:
+        if not os.path.isfile(media_path):
+            return False, f"Arquivo de mídia não encontrado: {media_path}"
+    
+    # Convert every non-.ogg file in a single batch instead of one at a time
+    # Convert a path listed twice only once, so every temporary file maps back to a path and gets removed
+    to_convert = list(dict.fromkeys(path for path in media_paths if not path.endswith(".ogg")))
+    try:
+        converted = dict(zip(to_convert, audio.convert_many_to_opus_ogg(to_convert, low_bitrate=low_bitrate)))
+    except Exception as e:
+        return False, f"Erro ao converter arquivo para opus ogg. Você provavelmente precisa instalar o ffmpeg: {str(e)}"
+    
+    all_success = True
+    status_messages = []
+    try:
+        for media_path in media_paths:
+            success, status_message = send_audio_message(recipient, converted.get(media_path, media_path))
+            all_success = all_success and success
+            status_messages.append(f"{media_path}: {status_message}")
+    finally:
+        for converted_path in converted.values():
+            _remove_converted_audio(converted_path)
+    
+    return all_success, "; ".join(status_messages)
 
 def download_media(message_id: str, chat_jid: str) -> Optional[str]:
     """Baixar mídia de uma mensagem e retornar o caminho do arquivo local.